@@ -5,15 +5,17 @@ Uses YouTube API to search and download songs.
 
 import os
 import json
+import queue
+import threading
 from pathlib import Path
 from typing import List, Dict
-from concurrent.futures import ThreadPoolExecutor
 from youtube import YouTubeAPI
 
 # Configuration
 DATASETS_DIR = "F:/datasets"  # Base directory for raw audio files
-MAX_WORKERS = 4  # Number of parallel downloads
+MAX_WORKERS = 4  # Fragments downloaded in parallel per track
 BATCH_SIZE = 50  # Number of songs to download in each batch
+AUDIO_SUFFIXES = {".mp3", ".m4a", ".opus", ".webm"}  # Downloaded audio formats
 
 def load_genres() -> Dict:
     """Load genre configuration from JSON."""
@@ -26,6 +28,41 @@ def create_genre_dirs(genres: Dict):
         genre_dir = Path(DATASETS_DIR) / genre
         genre_dir.mkdir(parents=True, exist_ok=True)
 
+def dedup_key(title: str) -> str:
+    """Normalize a title for duplicate detection.
+
+    Files on disk go through yt-dlp's sanitize_filename, which
+    replaces unsafe characters with fullwidth lookalikes, while
+    search results carry the raw title. Comparing only lowercase
+    alphanumerics makes both sides produce the same key.
+
+    Args:
+        title: Raw video title or on-disk filename stem
+
+    Returns:
+        Lowercase alphanumeric-only key
+    """
+    return "".join(char for char in title.lower() if char.isalnum())
+
+def scan_existing_tracks(output_dir: str) -> set:
+    """Index already-downloaded tracks with a single directory scan.
+
+    Args:
+        output_dir: Directory to scan
+
+    Returns:
+        Set of dedup keys for the tracks found on disk
+    """
+    existing = set()
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stem, suffix = os.path.splitext(entry.name)
+            if suffix.lower() in AUDIO_SUFFIXES:
+                existing.add(dedup_key(stem))
+    return existing
+
 def download_track(youtube: YouTubeAPI, query: str, output_dir: str) -> bool:
     """Download a single track.
     
@@ -72,51 +109,84 @@ def download_genre_tracks(
     """
     output_dir = str(Path(DATASETS_DIR) / genre)
     tracks_per_term = count // len(search_terms)
-    
+
+    # Tracks already on disk from previous runs; re-runs skip them
+    # instead of repeating the download
+    existing = scan_existing_tracks(output_dir)
+
     print(f"\nDownloading {count} tracks for genre: {genre}")
-    
+
     for term in search_terms:
         print(f"\nSearching for: {term}")
         downloaded = 0
         batch = 0
-        
+
+        # Producer thread keeps up to two search pages queued so the
+        # next batch's results are ready the moment downloads finish
+        result_queue = queue.Queue(maxsize=2)
+        stop_searching = threading.Event()
+
+        def search_batches(term=term):
+            search_batch = 0
+            while not stop_searching.is_set():
+                results = youtube.search(
+                    term,
+                    limit=BATCH_SIZE,
+                    offset=search_batch * BATCH_SIZE
+                )
+                result_queue.put(results)
+                if not results:
+                    break
+                search_batch += 1
+
+        producer = threading.Thread(target=search_batches, daemon=True)
+        producer.start()
+
         while downloaded < tracks_per_term:
-            # Calculate batch size
-            remaining = tracks_per_term - downloaded
-            current_batch = min(BATCH_SIZE, remaining)
-            
-            print(f"\nBatch {batch + 1}: Downloading {current_batch} tracks...")
-            
-            # Search for tracks
-            results = youtube.search(
-                term,
-                limit=current_batch,
-                offset=batch * BATCH_SIZE
-            )
-            
+            results = result_queue.get()
+
             if not results:
                 print("No more results found")
                 break
-                
-            # Download tracks in parallel
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = []
-                for video in results:
-                    future = executor.submit(
-                        youtube.download,
-                        video["url"],
-                        output_dir=output_dir
-                    )
-                    futures.append(future)
-                
-                # Wait for downloads to complete
-                for future in futures:
-                    if future.result():
-                        downloaded += 1
-                
+
+            # Cap the batch at what's still needed for this term
+            results = results[:tracks_per_term - downloaded]
+
+            print(f"\nBatch {batch + 1}: Downloading {len(results)} tracks...")
+
+            # Skip tracks already on disk; they count toward the quota
+            fresh = [
+                video for video in results
+                if dedup_key(video["title"]) not in existing
+            ]
+            skipped = len(results) - len(fresh)
+            if skipped:
+                print(f"Skipping {skipped} already-downloaded tracks")
+            downloaded += skipped
+
+            # Repack results into parallel lists and hand the whole
+            # batch to yt-dlp in one call
+            urls = [video["url"] for video in fresh]
+            downloaded += youtube.download_many(
+                urls,
+                output_dir=output_dir,
+                concurrent_fragments=MAX_WORKERS
+            )
+
+            # Remember what was queued so later batches and terms
+            # don't re-download duplicate search results
+            existing.update(
+                dedup_key(video["title"]) for video in fresh
+            )
+
             batch += 1
             print(f"Downloaded {downloaded}/{tracks_per_term} tracks for term: {term}")
 
+        # Stop the producer and unblock it if it's waiting on a full queue
+        stop_searching.set()
+        while not result_queue.empty():
+            result_queue.get_nowait()
+
 def main():
     """Main function to download all genre tracks."""
     # Load configuration
@@ -3,13 +3,16 @@ Voice synthesis module for MUSICAI2.
 Uses gTTS for basic voice synthesis with pitch and tempo control.
 """
 
-import os
+import io
 import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 import torch
 import torchaudio
 from gtts import gTTS
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 
 class VoiceSynthesizer:
@@ -30,6 +33,81 @@ class VoiceSynthesizer:
         with open(styles_path, 'r') as f:
             self.voice_styles = json.load(f)
 
+    # STFT parameters for tempo/pitch processing
+    _N_FFT = 1024
+    _HOP_LENGTH = 256
+
+    @staticmethod
+    @lru_cache(maxsize=4)
+    def _stft_window(device: str) -> torch.Tensor:
+        """Get the cached STFT analysis/synthesis window."""
+        return torch.hann_window(
+            VoiceSynthesizer._N_FFT,
+            device=torch.device(device)
+        )
+
+    def _apply_tempo_pitch(
+        self,
+        audio: torch.Tensor,
+        sr: int,
+        tempo: float,
+        pitch_shift: float
+    ) -> torch.Tensor:
+        """Apply tempo and pitch adjustments in a single STFT pass.
+
+        The tempo change and the stretch half of the pitch shift are
+        folded into one phase-vocoder warp, so the signal goes through
+        one STFT/iSTFT pair instead of two; the pitch shift is then
+        completed by resampling back to the original sample rate.
+
+        Args:
+            audio: Input waveform of shape (channels, length)
+            sr: Sample rate of the waveform
+            tempo: Speed multiplier (1.0 = normal)
+            pitch_shift: Semitones to shift pitch
+
+        Returns:
+            Processed waveform
+        """
+        # Stretch factor whose compensating resample yields the
+        # requested semitone shift
+        pitch_rate = 2.0 ** (-pitch_shift / 12.0)
+        rate = tempo * pitch_rate
+
+        if rate != 1.0:
+            window = self._stft_window(str(audio.device))
+            spec = torch.stft(
+                audio,
+                n_fft=self._N_FFT,
+                hop_length=self._HOP_LENGTH,
+                window=window,
+                return_complex=True
+            )
+            phase_advance = torch.linspace(
+                0,
+                math.pi * self._HOP_LENGTH,
+                spec.size(-2),
+                device=audio.device
+            )[..., None]
+            spec = torchaudio.functional.phase_vocoder(
+                spec, rate, phase_advance
+            )
+            audio = torch.istft(
+                spec,
+                n_fft=self._N_FFT,
+                hop_length=self._HOP_LENGTH,
+                window=window
+            )
+
+        if pitch_shift != 0.0:
+            audio = torchaudio.functional.resample(
+                audio,
+                orig_freq=int(round(sr / pitch_rate)),
+                new_freq=sr
+            )
+
+        return audio
+
     def generate_vocals(
         self,
         lyrics: str,
@@ -57,31 +135,27 @@ class VoiceSynthesizer:
             
             style_config = self.voice_styles[voice_style]
             
-            # Generate base audio with gTTS
+            # Generate base audio with gTTS straight into memory,
+            # skipping the temp-file write/read/delete round-trip
             tts = gTTS(text=lyrics, lang='en', slow=False)
-            temp_path = output_path + '.temp.mp3'
-            tts.save(temp_path)
-            
-            # Load generated audio for post-processing
-            audio, sr = torchaudio.load(temp_path)
-            os.remove(temp_path)  # Clean up temp file
+            buffer = io.BytesIO()
+            tts.write_to_fp(buffer)
+            buffer.seek(0)
+
+            # Load generated audio for post-processing; gTTS emits MP3,
+            # which only the ffmpeg backend decodes
+            audio, sr = torchaudio.load(
+                buffer, format='mp3', backend='ffmpeg'
+            )
             
-            # Apply tempo and pitch adjustments
+            # Apply tempo and pitch adjustments in one STFT pass
             if tempo != 1.0 or pitch_shift != 0.0:
-                # Time stretching
-                if tempo != 1.0:
-                    audio = torchaudio.transforms.TimeStretch(
-                        n_freq=1024,
-                        hop_length=256
-                    )(audio, tempo)
-                
-                # Pitch shifting
-                if pitch_shift != 0.0:
-                    audio = torchaudio.transforms.PitchShift(
-                        sample_rate=sr,
-                        n_steps=pitch_shift
-                    )(audio)
-            
+                audio = audio.to(self.device)
+                audio = self._apply_tempo_pitch(
+                    audio, sr, tempo, pitch_shift
+                )
+                audio = audio.cpu()
+
             # Save processed audio
             torchaudio.save(output_path, audio, sr)
             
@@ -127,6 +201,51 @@ class VoiceSynthesizer:
             print(f"Error generating preview: {e}")
             return None
 
+    def preview_all_voices(
+        self,
+        text: str,
+        output_dir: str,
+        styles: Optional[List[str]] = None
+    ) -> Dict[str, Optional[str]]:
+        """Generate previews for several voice styles concurrently.
+
+        Each preview is a blocking gTTS network request, so one worker
+        per style overlaps the request latency instead of paying it
+        serially.
+
+        Args:
+            text: Short text to synthesize
+            output_dir: Directory to save preview files
+            styles: Styles to preview (defaults to all configured)
+
+        Returns:
+            Dictionary mapping style names to preview paths,
+            with None for styles that failed
+        """
+        if styles is None:
+            styles = list(self.voice_styles)
+        if not styles:
+            return {}
+
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=len(styles)) as executor:
+            futures = {
+                style: executor.submit(
+                    self.preview_voice,
+                    text,
+                    style,
+                    str(output_dir / f'{style}.wav')
+                )
+                for style in styles
+            }
+
+            return {
+                style: future.result()
+                for style, future in futures.items()
+            }
+
     @property
     def available_styles(self) -> Dict[str, dict]:
         """Get available voice styles with descriptions."""
@@ -3,12 +3,17 @@ YouTube API wrapper for searching and downloading music.
 Uses youtube-dl for downloading and processing audio files.
 """
 
+import asyncio
 import os
+import threading
 from pathlib import Path
 from typing import List, Dict, Optional
 import yt_dlp
 import json
-import re
+
+# Translation table dropping filesystem-unsafe characters; built once
+# so clean_filename is a single C-level pass instead of a regex scan
+_UNSAFE_CHARS = str.maketrans('', '', '<>:"/\\|?*')
 
 
 class YouTubeAPI:
@@ -21,20 +26,84 @@ class YouTubeAPI:
         self.output_path = Path(output_path)
         self.output_path.mkdir(parents=True, exist_ok=True)
         
-        # Configure yt-dlp options
+        # Configure yt-dlp options. Keep the native m4a/opus container
+        # instead of re-encoding to MP3: this skips spawning an ffmpeg
+        # postprocessor per track, and downstream audio loading decodes
+        # m4a directly via the ffmpeg backend anyway.
         self.ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
+            'format': 'bestaudio[ext=m4a]/bestaudio',
             'outtmpl': '%(title)s.%(ext)s',
+            'quiet': True,
+            'no_warnings': True
+        }
+
+        # Search gets its own minimal option set: flat playlist
+        # extraction returns everything the result dicts need from a
+        # single search page, instead of a full metadata fetch per
+        # video, and download-only options don't leak in
+        self.search_opts = {
             'quiet': True,
             'no_warnings': True,
-            'extract_flat': False
+            'extract_flat': 'in_playlist',
+            'skip_download': True,
+            'default_search': 'ytsearch'
         }
 
+        # Long-lived yt-dlp contexts: constructing a YoutubeDL re-parses
+        # options and rebuilds the extractor registry on every call,
+        # which dominates short searches, so build once and reuse.
+        # YoutubeDL keeps mutable state (download counters, cookiejar)
+        # and is not thread-safe, so each thread caches its own
+        # instances (the web API serves requests on multiple threads).
+        self._local = threading.local()
+
+    def _get_search_ydl(self) -> yt_dlp.YoutubeDL:
+        """Get this thread's cached search context."""
+        ydl = getattr(self._local, 'search_ydl', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(self.search_opts)
+            self._local.search_ydl = ydl
+        return ydl
+
+    def _get_downloader(
+        self,
+        output_dir: Optional[str] = None
+    ) -> yt_dlp.YoutubeDL:
+        """Get this thread's cached download context for a directory.
+
+        Args:
+            output_dir: Optional custom output directory
+
+        Returns:
+            A reusable YoutubeDL instance writing to that directory
+        """
+        if output_dir:
+            outtmpl = os.path.join(output_dir, '%(title)s.%(ext)s')
+        else:
+            outtmpl = str(self.output_path / '%(title)s.%(ext)s')
+
+        downloaders = getattr(self._local, 'downloaders', None)
+        if downloaders is None:
+            downloaders = {}
+            self._local.downloaders = downloaders
+
+        ydl = downloaders.get(outtmpl)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL({**self.ydl_opts, 'outtmpl': outtmpl})
+            downloaders[outtmpl] = ydl
+        return ydl
+
+    def __del__(self):
+        """Close cached yt-dlp contexts."""
+        try:
+            ydl = getattr(self._local, 'search_ydl', None)
+            if ydl is not None:
+                ydl.close()
+            for ydl in getattr(self._local, 'downloaders', {}).values():
+                ydl.close()
+        except Exception:
+            pass
+
     def clean_filename(self, filename: str) -> str:
         """Clean filename to be safe for filesystem.
         
@@ -44,15 +113,10 @@ class YouTubeAPI:
         Returns:
             Cleaned filename
         """
-        # Remove invalid characters
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-        # Remove or replace other problematic characters
-        filename = filename.replace('&', 'and')
-        filename = filename.strip()
-        # Limit length
-        if len(filename) > 200:
-            filename = filename[:200]
-        return filename
+        # Remove invalid characters via the precompiled table,
+        # replace other problematic characters, and limit length
+        filename = filename.translate(_UNSAFE_CHARS)
+        return filename.replace('&', 'and').strip()[:200]
 
     def search(
         self,
@@ -71,89 +135,136 @@ class YouTubeAPI:
             List of video information dictionaries
         """
         try:
-            search_opts = {
-                **self.ydl_opts,
-                'extract_flat': True,
-                'quiet': True,
-                'no_warnings': True,
-                'playlistend': limit + offset
-            }
-            
-            with yt_dlp.YoutubeDL(search_opts) as ydl:
-                # Perform search
-                results = ydl.extract_info(
-                    f"ytsearch{limit + offset}:{query}",
-                    download=False
-                )
-                
-                if not results or 'entries' not in results:
-                    return []
-                
-                # Process results
-                videos = []
-                for entry in results['entries'][offset:]:
-                    if entry:
-                        videos.append({
-                            'title': entry.get('title', ''),
-                            'url': entry.get('url', ''),
-                            'duration': entry.get('duration', 0),
-                            'id': entry.get('id', '')
-                        })
-                
-                return videos
-                
+            # Perform search on the cached flat-extraction context;
+            # the ytsearchN: prefix already bounds the result count
+            results = self._get_search_ydl().extract_info(
+                f"ytsearch{limit + offset}:{query}",
+                download=False
+            )
+
+            if not results or 'entries' not in results:
+                return []
+
+            # Process results
+            videos = []
+            for entry in results['entries'][offset:]:
+                if entry:
+                    videos.append({
+                        'title': entry.get('title', ''),
+                        'url': entry.get('url', ''),
+                        'duration': entry.get('duration', 0),
+                        'id': entry.get('id', '')
+                    })
+
+            return videos
+
         except Exception as e:
             print(f"Error searching YouTube: {e}")
             return []
 
     def download(self, url: str, output_dir: Optional[str] = None) -> Optional[str]:
-        """Download a YouTube video as MP3.
-        
+        """Download a YouTube video's audio stream.
+
         Args:
             url: YouTube video URL
             output_dir: Optional custom output directory
-            
+
         Returns:
             Path to downloaded file or None if failed
         """
         try:
-            # Configure download options
-            if output_dir:
-                download_opts = {
-                    **self.ydl_opts,
-                    'outtmpl': os.path.join(
-                        output_dir,
-                        '%(title)s.%(ext)s'
-                    )
-                }
-            else:
-                download_opts = {
-                    **self.ydl_opts,
-                    'outtmpl': str(self.output_path / '%(title)s.%(ext)s')
-                }
-            
-            # Download and convert to MP3
-            with yt_dlp.YoutubeDL(download_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                
-                if info:
-                    # Clean filename
-                    filename = self.clean_filename(info['title'])
-                    if output_dir:
-                        output_path = os.path.join(output_dir, f"{filename}.mp3")
-                    else:
-                        output_path = str(self.output_path / f"{filename}.mp3")
-                    
-                    # Verify file exists
-                    if os.path.exists(output_path):
-                        return output_path
-                        
+            # Download the native audio stream on a cached context
+            ydl = self._get_downloader(output_dir)
+            info = ydl.extract_info(url, download=True)
+
+            if info:
+                output_path = ydl.prepare_filename(info)
+
+                # Verify file exists
+                if os.path.exists(output_path):
+                    return output_path
+
             return None
             
         except Exception as e:
             print(f"Error downloading {url}: {e}")
             return None
 
+    def download_many(
+        self,
+        urls: List[str],
+        output_dir: Optional[str] = None,
+        concurrent_fragments: Optional[int] = None
+    ) -> int:
+        """Download several videos with one yt-dlp invocation.
+
+        Handing the whole URL list to a single ``ydl.download`` call
+        lets yt-dlp reuse its HTTP session and extractor state across
+        tracks instead of paying per-call setup for each one.
+
+        Args:
+            urls: YouTube video URLs
+            output_dir: Optional custom output directory
+            concurrent_fragments: Fragments to download in parallel
+                per track (yt-dlp's concurrent_fragment_downloads)
+
+        Returns:
+            Number of tracks downloaded successfully
+        """
+        if not urls:
+            return 0
+
+        if output_dir:
+            outtmpl = os.path.join(output_dir, '%(title)s.%(ext)s')
+        else:
+            outtmpl = str(self.output_path / '%(title)s.%(ext)s')
+
+        finished = set()
+
+        def progress_hook(progress):
+            if progress['status'] == 'finished':
+                finished.add(progress.get('filename'))
+
+        batch_opts = {
+            **self.ydl_opts,
+            'outtmpl': outtmpl,
+            'ignoreerrors': True,
+            'progress_hooks': [progress_hook]
+        }
+        if concurrent_fragments:
+            batch_opts['concurrent_fragment_downloads'] = concurrent_fragments
+
+        try:
+            with yt_dlp.YoutubeDL(batch_opts) as ydl:
+                ydl.download(list(urls))
+        except Exception as e:
+            print(f"Error downloading batch: {e}")
+
+        return len(finished)
+
+    async def download_async(
+        self,
+        url: str,
+        output_dir: Optional[str] = None
+    ) -> Optional[str]:
+        """Asynchronously download a YouTube video's audio stream.
+
+        Runs the blocking yt-dlp download on the event loop's default
+        executor, so callers can fan out many downloads with
+        ``asyncio.gather`` instead of dedicating a thread per URL.
+
+        Args:
+            url: YouTube video URL
+            output_dir: Optional custom output directory
+
+        Returns:
+            Path to downloaded file or None if failed
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.download, url, output_dir
+        )
+
     def search_and_download(self, query: str, limit: int = 1) -> List[str]:
         """Search for videos and download them.
         